@@ -20,11 +20,14 @@ if sys.version_info < (2, 7):  # pragma: no cover
     raise Exception('Koala requires Python versions 2.7 or later.')
 
 STATICA_HACK = True
+# Static analyzers only see the assignment above; at runtime the flag is cleared so that the submodules are imported
+# lazily by `module.__getattr__` below rather than all at once when koalacore is first imported.
+globals()['kcah_acitats'[::-1].upper()] = False
 if STATICA_HACK:  # pragma: no cover
     # This is never executed, but tricks static analyzers (PyDev, PyCharm,
     # pylint, etc.) into knowing the types of these symbols, and what
     # they contain.
-    from koalacore.api import BaseAPI, BaseSubAPI, BaseResource, Resource, BaseResourceProperty, ResourceProperty, ComputedResourceProperty  # noqa
+    from koalacore.api import BaseAPI, BaseSubAPI, BaseResource, Resource, BaseResourceProperty, ResourceProperty, ComputedResourceProperty, SearchIndexUpdateMiddleware, flush_search_index_updates  # noqa
     from koalacore.tools import DictDiffer, generate_autocomplete_tokens, eval_boolean_string, convert_to_unicode, csv_item_convert  # noqa
     from koalacore.search import GAESearchInterface, Result
     from koalacore.rbac import PermissionDenied, PermissionsStorage, RBAC
@@ -37,7 +40,7 @@ if STATICA_HACK:  # pragma: no cover
 
 # import mapping to objects in other modules
 all_by_module = {
-    '{}.api'.format(PACKAGE_NAME): ['BaseAPI', 'BaseSubAPI', 'BaseResource', 'Resource', 'BaseResourceProperty', 'ResourceProperty', 'ComputedResourceProperty'],
+    '{}.api'.format(PACKAGE_NAME): ['BaseAPI', 'BaseSubAPI', 'BaseResource', 'Resource', 'BaseResourceProperty', 'ResourceProperty', 'ComputedResourceProperty', 'SearchIndexUpdateMiddleware', 'flush_search_index_updates'],
     '{}.tools'.format(PACKAGE_NAME): ['DictDiffer', 'generate_autocomplete_tokens', 'eval_boolean_string', 'convert_to_unicode', 'csv_item_convert'],
     '{}.search'.format(PACKAGE_NAME): ['GAESearchInterface', 'Result'],
     '{}.rbac'.format(PACKAGE_NAME): ['PermissionDenied', 'PermissionsStorage', 'RBAC'],
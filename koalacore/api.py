@@ -8,7 +8,10 @@
     :copyright: (c) 2015 Lighthouse
     :license: LGPL
 """
-
+import logging
+import operator
+import sys
+import threading
 from blinker import signal
 from google.appengine.ext import deferred
 
@@ -21,6 +24,17 @@ __author__ = 'Matt Badger'
 # cause other functions to throw exceptions. Check the return value before processing the post_ signals?
 
 
+# Signals are resolved once at import time rather than on every call. Blinker always returns the same NamedSignal
+# instance for a given name so receivers connected elsewhere via signal('pre_insert') etc. are unaffected.
+_SIGNALS = {name: (signal('pre_{}'.format(name)), signal('post_{}'.format(name)))
+            for name in ('insert', 'get', 'update', 'patch', 'delete', 'search',
+                         'insert_multi', 'get_multi', 'update_multi', 'delete_multi')}
+
+# Search index updates queued by APIs with batching enabled. Kept per thread so that concurrent requests do not flush
+# each other's updates.
+_pending_search_index_updates = threading.local()
+
+
 # Result should always be the first argument to the post_ signals. That way the receivers can check the value before
 # continuing execution.
 class BaseAPI(object):
@@ -28,6 +42,10 @@ class BaseAPI(object):
     _api_model = None
     _datastore_interface = None
     _search_interface = None
+    _search_index_queue = 'search-index-update'
+    # If True then insert/update/patch only record the resource uid; call flush_search_index_updates() (e.g. at the
+    # end of the request, or wrap the WSGI app in SearchIndexUpdateMiddleware) to queue a single task for all of them.
+    _batch_search_index_updates = False
 
     @classmethod
     def new(cls, **kwargs):
@@ -35,90 +53,292 @@ class BaseAPI(object):
 
     @classmethod
     def insert(cls, resource_object, auth_uid=None, **kwargs):
-        if signal('pre_insert').has_receivers_for(cls):
-            signal('pre_insert').send(cls, resource_object=resource_object, auth_uid=auth_uid, **kwargs)
+        pre_hook, post_hook = _SIGNALS['insert']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_object=resource_object, auth_uid=auth_uid, **kwargs)
 
         resource_uid = cls._datastore_interface.insert(resource_object=resource_object, **kwargs)
-        deferred.defer(cls._update_search_index, resource_uid=resource_uid, _queue='search-index-update')
+        cls._queue_search_index_update(resource_uid=resource_uid)
 
-        if signal('post_insert').has_receivers_for(cls):
-            signal('post_insert').send(cls, result=resource_uid, resource_uid=resource_uid,
-                                       resource_object=resource_object, auth_uid=auth_uid, **kwargs)
+        if post_hook.receivers:
+            post_hook.send(cls, result=resource_uid, resource_uid=resource_uid,
+                           resource_object=resource_object, auth_uid=auth_uid, **kwargs)
         return resource_uid
 
     @classmethod
     def get(cls, resource_uid, **kwargs):
-        if signal('pre_get').has_receivers_for(cls):
-            signal('pre_get').send(cls, resource_uid=resource_uid, **kwargs)
+        pre_hook, post_hook = _SIGNALS['get']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_uid=resource_uid, **kwargs)
 
         resource = cls._datastore_interface.get(resource_uid=resource_uid)
 
-        if signal('post_get').has_receivers_for(cls):
-            signal('post_get').send(cls, result=resource, resource_uid=resource_uid, **kwargs)
+        if post_hook.receivers:
+            post_hook.send(cls, result=resource, resource_uid=resource_uid, **kwargs)
 
         return resource
 
     @classmethod
     def update(cls, resource_object, auth_uid=None, **kwargs):
-        if signal('pre_update').has_receivers_for(cls):
-            signal('pre_update').send(cls, resource_object=resource_object, auth_uid=auth_uid, **kwargs)
+        pre_hook, post_hook = _SIGNALS['update']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_object=resource_object, auth_uid=auth_uid, **kwargs)
 
         resource_uid = cls._datastore_interface.update(resource_object=resource_object, **kwargs)
-        deferred.defer(cls._update_search_index, resource_uid=resource_uid, _queue='search-index-update')
+        cls._queue_search_index_update(resource_uid=resource_uid)
 
-        if signal('post_update').has_receivers_for(cls):
-            signal('post_update').send(cls, result=resource_uid, resource_uid=resource_uid,
-                                       resource_object=resource_object, auth_uid=auth_uid, **kwargs)
+        if post_hook.receivers:
+            post_hook.send(cls, result=resource_uid, resource_uid=resource_uid,
+                           resource_object=resource_object, auth_uid=auth_uid, **kwargs)
 
         return resource_uid
 
     @classmethod
     def patch(cls, resource_uid, delta_update, auth_uid=None, **kwargs):
-        if signal('pre_patch').has_receivers_for(cls):
-            signal('pre_patch').send(cls, resource_uid=resource_uid, delta_update=delta_update, auth_uid=auth_uid,
-                                     **kwargs)
+        pre_hook, post_hook = _SIGNALS['patch']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_uid=resource_uid, delta_update=delta_update, auth_uid=auth_uid,
+                          **kwargs)
 
         resource_uid = cls._datastore_interface.patch(resource_uid=resource_uid, delta_update=delta_update, **kwargs)
-        deferred.defer(cls._update_search_index, resource_uid=resource_uid, _queue='search-index-update')
+        cls._queue_search_index_update(resource_uid=resource_uid)
 
-        if signal('post_patch').has_receivers_for(cls):
-            signal('post_patch').send(cls, result=resource_uid, resource_uid=resource_uid, delta_update=delta_update,
-                                      auth_uid=auth_uid, **kwargs)
+        if post_hook.receivers:
+            post_hook.send(cls, result=resource_uid, resource_uid=resource_uid, delta_update=delta_update,
+                           auth_uid=auth_uid, **kwargs)
 
         return resource_uid
 
     @classmethod
     def delete(cls, resource_uid, auth_uid=None, **kwargs):
-        if signal('pre_delete').has_receivers_for(cls):
-            signal('pre_delete').send(cls, resource_uid=resource_uid, auth_uid=auth_uid, **kwargs)
+        pre_hook, post_hook = _SIGNALS['delete']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_uid=resource_uid, auth_uid=auth_uid, **kwargs)
 
         cls._datastore_interface.delete(resource_uid=resource_uid, **kwargs)
-        deferred.defer(cls._delete_search_index, resource_uid=resource_uid, _queue='search-index-update')
+        deferred.defer(cls._delete_search_index, resource_uid=resource_uid, _queue=cls._search_index_queue)
 
-        if signal('post_delete').has_receivers_for(cls):
-            signal('post_delete').send(cls, result=None, resource_uid=resource_uid, auth_uid=auth_uid, **kwargs)
+        if post_hook.receivers:
+            post_hook.send(cls, result=None, resource_uid=resource_uid, auth_uid=auth_uid, **kwargs)
 
     @classmethod
     def search(cls, query_string, **kwargs):
-        if signal('pre_search').has_receivers_for(cls):
-            signal('pre_search').send(cls, query_string=query_string, **kwargs)
+        pre_hook, post_hook = _SIGNALS['search']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, query_string=query_string, **kwargs)
 
         search_result = cls._search_interface.search(query_string=query_string, **kwargs)
 
-        if signal('post_search').has_receivers_for(cls):
-            signal('post_search').send(cls, result=search_result, query_string=query_string, **kwargs)
+        if post_hook.receivers:
+            post_hook.send(cls, result=search_result, query_string=query_string, **kwargs)
 
         return search_result
 
+    @classmethod
+    def insert_multi(cls, resource_objects, auth_uid=None, **kwargs):
+        pre_hook, post_hook = _SIGNALS['insert_multi']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_objects=resource_objects, auth_uid=auth_uid, **kwargs)
+
+        # Start every operation before resolving any of them so that NDB can batch the RPCs
+        futures = [cls._datastore_interface.insert_async(resource_object=resource_object, **kwargs)
+                   for resource_object in resource_objects]
+        resource_uids = [cls._datastore_interface.parse_insert_async_result(future=future) for future in futures]
+        cls._queue_search_index_updates(resource_uids=resource_uids)
+
+        if post_hook.receivers:
+            post_hook.send(cls, result=resource_uids, resource_uids=resource_uids,
+                           resource_objects=resource_objects, auth_uid=auth_uid, **kwargs)
+        return resource_uids
+
+    @classmethod
+    def get_multi(cls, resource_uids, **kwargs):
+        pre_hook, post_hook = _SIGNALS['get_multi']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_uids=resource_uids, **kwargs)
+
+        futures = [cls._datastore_interface.get_async(resource_uid=resource_uid) for resource_uid in resource_uids]
+        resources = [cls._datastore_interface.parse_get_async_result(future=future) for future in futures]
+
+        if post_hook.receivers:
+            post_hook.send(cls, result=resources, resource_uids=resource_uids, **kwargs)
+
+        return resources
+
+    @classmethod
+    def update_multi(cls, resource_objects, auth_uid=None, **kwargs):
+        pre_hook, post_hook = _SIGNALS['update_multi']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_objects=resource_objects, auth_uid=auth_uid, **kwargs)
+
+        futures = [cls._datastore_interface.update_async(resource_object=resource_object, **kwargs)
+                   for resource_object in resource_objects]
+        resource_uids = [cls._datastore_interface.parse_update_async_result(future=future) for future in futures]
+        cls._queue_search_index_updates(resource_uids=resource_uids)
+
+        if post_hook.receivers:
+            post_hook.send(cls, result=resource_uids, resource_uids=resource_uids,
+                           resource_objects=resource_objects, auth_uid=auth_uid, **kwargs)
+
+        return resource_uids
+
+    @classmethod
+    def delete_multi(cls, resource_uids, auth_uid=None, **kwargs):
+        pre_hook, post_hook = _SIGNALS['delete_multi']
+
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_uids=resource_uids, auth_uid=auth_uid, **kwargs)
+
+        futures = [cls._datastore_interface.delete_async(resource_uid=resource_uid, **kwargs)
+                   for resource_uid in resource_uids]
+        for future in futures:
+            cls._datastore_interface.parse_delete_async_result(future=future)
+
+        if resource_uids:
+            deferred.defer(cls._delete_search_index_batch, resource_uids=list(resource_uids),
+                           _queue=cls._search_index_queue)
+
+        if post_hook.receivers:
+            post_hook.send(cls, result=None, resource_uids=resource_uids, auth_uid=auth_uid, **kwargs)
+
+    @classmethod
+    def flush_search_index_updates(cls):
+        """
+        Queue a single task to update the search index for every resource uid recorded (on this thread) since the
+        last flush. Does nothing if there are no pending updates. If the task can't be queued the uids are kept
+        pending, so that the flush can be retried, and the error is raised.
+        """
+        try:
+            pending = _pending_search_index_updates.uids
+            resource_uids, seen_uids = pending.pop(cls)
+        except (AttributeError, KeyError):
+            return
+
+        try:
+            deferred.defer(cls._update_search_index_batch, resource_uids=resource_uids, _queue=cls._search_index_queue)
+        except Exception:
+            pending[cls] = (resource_uids, seen_uids)
+            raise
+
+    @classmethod
+    def _queue_search_index_update(cls, resource_uid):
+        if not cls._batch_search_index_updates:
+            deferred.defer(cls._update_search_index, resource_uid=resource_uid, _queue=cls._search_index_queue)
+            return
+
+        try:
+            pending = _pending_search_index_updates.uids
+        except AttributeError:
+            pending = _pending_search_index_updates.uids = {}
+
+        # The list keeps the uids in order; the set makes the duplicate check O(1) for large batches
+        try:
+            resource_uids, seen_uids = pending[cls]
+        except KeyError:
+            resource_uids, seen_uids = pending[cls] = ([], set())
+
+        if resource_uid not in seen_uids:
+            seen_uids.add(resource_uid)
+            resource_uids.append(resource_uid)
+
+    @classmethod
+    def _queue_search_index_updates(cls, resource_uids):
+        if cls._batch_search_index_updates:
+            for resource_uid in resource_uids:
+                cls._queue_search_index_update(resource_uid=resource_uid)
+        elif resource_uids:
+            # One task for the whole batch rather than one per resource
+            deferred.defer(cls._update_search_index_batch, resource_uids=list(resource_uids),
+                           _queue=cls._search_index_queue)
+
     @classmethod
     def _update_search_index(cls, resource_uid, **kwargs):
         resource = cls.get(resource_uid=resource_uid)
         cls._search_interface.insert(resource_object=resource, **kwargs)
 
+    @classmethod
+    def _update_search_index_batch(cls, resource_uids, **kwargs):
+        # Loaded through get_multi so the API signals still fire; receivers see one pre_/post_get_multi for the batch
+        # rather than a pre_/post_get per resource as with _update_search_index.
+        resources = [resource for resource in cls.get_multi(resource_uids=resource_uids) if resource is not None]
+
+        if resources:
+            cls._search_interface.insert_multi(resource_objects=resources, **kwargs)
+
     @classmethod
     def _delete_search_index(cls, resource_uid, **kwargs):
         cls._search_interface.delete(resource_object_uid=resource_uid, **kwargs)
 
+    @classmethod
+    def _delete_search_index_batch(cls, resource_uids, **kwargs):
+        cls._search_interface.delete_multi(resource_object_uids=resource_uids, **kwargs)
+
+
+def flush_search_index_updates():
+    """
+    Flush the batched search index updates of every API that has recorded any on this thread. Each API queues a single
+    task covering all of its resources.
+
+    Every API is flushed even if one of them fails, then the first error is raised. Updates that could not be queued
+    are dropped rather than kept pending, so that they don't leak into the next request handled by this thread.
+    """
+    pending = getattr(_pending_search_index_updates, 'uids', None)
+    if not pending:
+        return
+
+    exc_info = None
+    try:
+        for api in pending.keys():
+            try:
+                api.flush_search_index_updates()
+            except Exception:
+                if exc_info is None:
+                    exc_info = sys.exc_info()
+                else:
+                    logging.exception(u'Flushing search index updates for {} failed'.format(api.__name__))
+    finally:
+        pending.clear()
+
+    if exc_info is not None:
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+
+class SearchIndexUpdateMiddleware(object):
+    """
+    WSGI middleware that flushes batched search index updates (see BaseAPI._batch_search_index_updates) once the
+    wrapped application has handled the request, even if it raised. If both the application and the flush fail, the
+    flush error is logged and the application's exception is re-raised.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        try:
+            response = self.app(environ, start_response)
+        except Exception:
+            exc_info = sys.exc_info()
+            try:
+                flush_search_index_updates()
+            except Exception:
+                logging.exception(u'Flushing search index updates failed')
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+        try:
+            flush_search_index_updates()
+        except Exception:
+            logging.exception(u'Flushing search index updates failed')
+            raise
+        return response
+
 
 class BaseSubAPI(object):
     _api_name = ''
@@ -127,25 +347,26 @@ class BaseSubAPI(object):
 
     @classmethod
     def _parse_patch_keys(cls, delta_update):
-        delta_keys = set(delta_update.keys())
-        unauthorized_keys = delta_keys - cls._allowed_patch_keys
-        if unauthorized_keys:
+        # Subset test first so that the common (valid) case doesn't allocate a new set
+        if not cls._allowed_patch_keys.issuperset(delta_update):
+            unauthorized_keys = set(delta_update) - cls._allowed_patch_keys
             raise ValueError(u'Cannot perform patch as "{}" are unauthorized keys'.format(unauthorized_keys))
 
     @classmethod
     def patch(cls, resource_uid, delta_update, **kwargs):
         cls._parse_patch_keys(delta_update=delta_update)
+        pre_hook, post_hook = _SIGNALS['patch']
 
-        if signal('pre_patch').has_receivers_for(cls):
-            signal('pre_patch').send(cls, resource_uid=resource_uid, delta_update=delta_update, **kwargs)
+        if pre_hook.receivers:
+            pre_hook.send(cls, resource_uid=resource_uid, delta_update=delta_update, **kwargs)
 
         resource_uid = cls._parent_api._datastore_interface.patch(resource_uid=resource_uid, delta_update=delta_update,
                                                                   **kwargs)
-        deferred.defer(cls._parent_api._update_search_index, resource_uid=resource_uid, _queue='search-index-update')
+        cls._parent_api._queue_search_index_update(resource_uid=resource_uid)
 
-        if signal('post_patch').has_receivers_for(cls):
-            signal('post_patch').send(cls, result=resource_uid, resource_uid=resource_uid, delta_update=delta_update,
-                                      **kwargs)
+        if post_hook.receivers:
+            post_hook.send(cls, result=resource_uid, resource_uid=resource_uid, delta_update=delta_update,
+                           **kwargs)
 
         return resource_uid
 
@@ -170,21 +391,40 @@ class BaseResourceProperty(object):
         """Return a compact unambiguous string representation of a property."""
         args = []
         cls = self.__class__
-        for i, attr in enumerate(self._attributes):
-            val = getattr(self, attr)
-            if val is not getattr(cls, attr):
+        getter, defaults, labels = cls._get_repr_info()
+        for val, default, label in zip(getter(self), defaults, labels):
+            if val is not default:
                 if isinstance(val, type):
                     s = val.__name__
                 else:
                     s = repr(val)
-                if i >= cls._positional:
-                    if attr.startswith('_'):
-                        attr = attr[1:]
-                    s = '%s=%s' % (attr, s)
+                if label is not None:
+                    s = '%s=%s' % (label, s)
                 args.append(s)
         s = '%s(%s)' % (self.__class__.__name__, ', '.join(args))
         return s
 
+    @classmethod
+    def _get_repr_info(cls):
+        """Return the attribute getter, class defaults and keyword labels used by __repr__; built once per class."""
+        try:
+            return cls.__dict__['_repr_info']
+        except KeyError:
+            pass
+
+        attributes = tuple(cls._attributes)
+        if len(attributes) > 1:
+            getter = operator.attrgetter(*attributes)
+        else:
+            # attrgetter only returns a tuple when given more than one name
+            getter = lambda prop: tuple(getattr(prop, attr) for attr in attributes)
+        defaults = tuple(getattr(cls, attr) for attr in attributes)
+        labels = tuple(None if i < cls._positional else (attr[1:] if attr.startswith('_') else attr)
+                       for i, attr in enumerate(attributes))
+
+        cls._repr_info = (getter, defaults, labels)
+        return cls._repr_info
+
     def __get__(self, entity, unused_cls=None):
         """Descriptor protocol: get the value from the entity."""
         if entity is None:
@@ -193,6 +433,8 @@ class BaseResourceProperty(object):
 
     def __set__(self, entity, value):
         """Descriptor protocol: set the value on the entity."""
+        if entity._computed_values:
+            entity._computed_values.clear()
         entity._values[self._name] = value
 
     def _fix_up(self, cls, code_name):
@@ -210,13 +452,114 @@ class BaseResourceProperty(object):
         """
         if self._name is None:
             self._name = code_name
+        elif type(self._name) is str:
+            # Code names are interned by the compiler but explicit names may be built at runtime. Interning keeps the
+            # _values/_history lookups on the identity fast path.
+            self._name = intern(self._name)
 
     def _has_value(self, entity, unused_rest=None):
         """Internal helper to ask if the entity has a value for this Property."""
         return self._name in entity._values
 
+    def _initial_value_format(self):
+        """Internal helper to ask how an initial value is stored.
+
+        Returns (True, formatter) if setting a value during entity init just stores it in _values, after passing it
+        through formatter unless the formatter or value is None. Returns (False, None) if __set__ has to be called.
+        """
+        return type(self).__set__.__func__ is BaseResourceProperty.__set__.__func__, None
+
+
+def _map_string_method(method_name, items):
+    """Call a no-argument string method on each item and return the results as a list.
+
+    When the items share a type the unbound method is mapped over them in C; mixed str/unicode items fall back to a
+    list comprehension. Raises AttributeError if any item doesn't have the method.
+    """
+    for first in items:
+        break
+    else:
+        return []
+    try:
+        return map(getattr(type(first), method_name), items)
+    except TypeError:
+        return [getattr(item, method_name)() for item in items]
+
+
+def _strip_list(value):
+    try:
+        return _map_string_method('strip', value)
+    except AttributeError:
+        # The value cannot simply be stripped. Custom formatting should be used in a dedicated method.
+        return value
+
+
+def _strip_set(value):
+    try:
+        return set(_map_string_method('strip', value))
+    except AttributeError:
+        # The value cannot simply be stripped. Custom formatting should be used in a dedicated method.
+        return value
+
+
+def _lower_list(value):
+    try:
+        return _map_string_method('lower', value)
+    except AttributeError:
+        # The value cannot simply be lowered. Custom formatting should be used in a dedicated method.
+        return value
+
+
+# Formatters for the common value types, looked up by exact type so that the usual case is a single dict lookup
+# instead of a chain of hasattr/isinstance checks. Anything else (including subclasses) takes the generic path.
+_STRIP_BY_TYPE = {str: str.strip, unicode: unicode.strip, list: _strip_list, set: _strip_set}
+_LOWER_BY_TYPE = {str: str.lower, unicode: unicode.lower, list: _lower_list}
+
+
+def _strip_value(value):
+    """Strip whitespace from a value, or from each item in a list/set value."""
+    strip = _STRIP_BY_TYPE.get(type(value))
+    if strip is not None:
+        return strip(value)
+    elif hasattr(value, 'strip'):
+        return value.strip()
+    elif isinstance(value, list):
+        return _strip_list(value)
+    elif isinstance(value, set):
+        return _strip_set(value)
+    return value
+
+
+def _lower_value(value):
+    """Lowercase a value, or each item in a list value."""
+    lower = _LOWER_BY_TYPE.get(type(value))
+    if lower is not None:
+        return lower(value)
+    elif hasattr(value, 'lower'):
+        return value.lower()
+    elif isinstance(value, list):
+        return _lower_list(value)
+    return value
+
+
+def _strip_and_lower_value(value):
+    return _lower_value(_strip_value(value))
+
+
+_MISSING = object()
+# Values of these types can be changed in place, so rewriting an equal value may still be a real change.
+_MUTABLE_VALUE_TYPES = (list, set, dict)
+
 
 class ResourceProperty(BaseResourceProperty):
+    _immutable = False
+    _unique = False
+    _strip = True
+    _lower = False
+    # Writing a value equal to the stored one after init isn't recorded in the history or unique checks, so re-saving an
+    # entity doesn't add them. The value is still stored. Set to False on a subclass to always record the write.
+    _skip_noop_writes = True
+
     _attributes = BaseResourceProperty._attributes + ['_immutable', '_unique', '_strip', '_lower']
 
     def __init__(self, immutable=False, unique=False, track_revisions=True, strip_whitespace=True,
@@ -228,65 +571,93 @@ class ResourceProperty(BaseResourceProperty):
         self._strip = strip_whitespace
         self._lower = force_lowercase
 
+        # Pick the formatting function once so that __set__ doesn't have to re-check the flags on every write.
+        if strip_whitespace and force_lowercase:
+            self._format = _strip_and_lower_value
+        elif strip_whitespace:
+            self._format = _strip_value
+        elif force_lowercase:
+            self._format = _lower_value
+        else:
+            self._format = None
+
     def __set__(self, entity, value):
         """Descriptor protocol: set the value on the entity."""
-
-        if entity._init_complete:
-            if self._immutable:
-                raise AssertionError('"{}" is immutable.'.format(self._name))
-
-        if self._strip:
-            if value is not None:
-                if hasattr(value, 'strip'):
-                    value = value.strip()
-                elif isinstance(value, list):
-                    try:
-                        value = [item.strip() for item in value]
-                    except AttributeError:
-                        # The value cannot simply be stripped. Custom formatting should be used in a dedicated method.
-                        pass
-                elif isinstance(value, set):
-                    value_list = list(value)
-                    try:
-                        value = set([item.strip() for item in value_list])
-                    except AttributeError:
-                        # The value cannot simply be stripped. Custom formatting should be used in a dedicated method.
-                        pass
-        if self._lower:
-            if value is not None:
-                if hasattr(value, 'lower'):
-                    value = value.lower()
-                elif isinstance(value, list):
-                    try:
-                        value = [item.lower() for item in value]
-                    except AttributeError:
-                        # The value cannot simply be lowered. Custom formatting should be used in a dedicated method.
-                        pass
-
-        if entity._init_complete:
+        init_complete = entity._init_complete
+        if init_complete and self._immutable:
+            raise AssertionError('"{}" is immutable.'.format(self._name))
+
+        if value is not None and self._format is not None:
+            value = self._format(value)
+
+        # Initial values have nothing to track
+        track = init_complete
+        if track and self._skip_noop_writes and not isinstance(value, _MUTABLE_VALUE_TYPES):
+            current = entity._values.get(self._name, _MISSING)
+            # Equal values of another type (1 and True, 'a' and u'a') are still a change. Unchanged values are stored
+            # anyway so that the entity always holds the object that was assigned.
+            track = not (current is value or (type(current) is type(value) and current == value))
+
+        if track:
             if self._unique:
-                entity._uniques_modified.append(self._name)
+                if entity._uniques_modified is None:
+                    entity._uniques_modified = [self._name]
+                else:
+                    entity._uniques_modified.append(self._name)
             if self._track_revisions:
-                if self._name in entity._history:
-                    entity._history[self._name] = (entity._history[self._name][0], value)
+                history = entity._history
+                if history is None:
+                    history = entity._history = {}
+                # History entries are always tuples so None means the property hasn't been tracked yet
+                previous = history.get(self._name)
+                if previous is None:
+                    history[self._name] = (entity._values.get(self._name, self._default), value)
                 else:
-                    entity._history[self._name] = (getattr(entity, self._name, None), value)
+                    history[self._name] = (previous[0], value)
 
-        super(ResourceProperty, self).__set__(entity=entity, value=value)
+        if entity._computed_values:
+            entity._computed_values.clear()
+        entity._values[self._name] = value
+
+    def _initial_value_format(self):
+        """See BaseResourceProperty._initial_value_format."""
+        if type(self).__set__.__func__ is ResourceProperty.__set__.__func__:
+            return True, self._format
+        return False, None
 
 
 class ComputedResourceProperty(BaseResourceProperty):
-    _attributes = BaseResourceProperty._attributes + ['_compute_function']
+    """A read only property whose value is computed from the entity.
+
+    Pass cached=True to reuse the computed value until another property is set on the entity. Only do this if
+    compute_function depends solely on the entity's property values; changes made in place (e.g. appending to a list
+    value) don't invalidate the cache.
+    """
+    _compute_function = None
+    _cached = False
 
-    def __init__(self, compute_function, **kwargs):
+    _attributes = BaseResourceProperty._attributes + ['_compute_function', '_cached']
+
+    def __init__(self, compute_function, cached=False, **kwargs):
         super(ComputedResourceProperty, self).__init__(**kwargs)
         self._compute_function = compute_function
+        self._cached = cached
 
     def __get__(self, entity, unused_cls=None):
         """Descriptor protocol: get the value from the entity."""
         if entity is None:
             return self  # __get__ called on class
-        return self._compute_function(entity)
+        if not self._cached:
+            return self._compute_function(entity)
+
+        computed_values = entity._computed_values
+        if computed_values is None:
+            computed_values = entity._computed_values = {}
+        try:
+            return computed_values[self._name]
+        except KeyError:
+            value = computed_values[self._name] = self._compute_function(entity)
+            return value
 
 
 class MetaModel(type):
@@ -321,42 +692,104 @@ class BaseResource(object):
     """
 
     __metaclass__ = MetaModel
+    # Resources are created in bulk (query results, search results) so avoid a per-instance __dict__. Subclasses that
+    # don't declare __slots__ still get a __dict__ for any extra attributes they set.
+    __slots__ = ('_init_complete', '_values', '_uniques_modified', '_history', '_computed_values')
 
     _properties = None
+    _sorted_properties = ()
+    _initial_value_formats = {}
+    _plain_property_names = frozenset()
     _uniques = None
 
     def __init__(self, **kwargs):
         self._init_complete = False
         self._values = {}
-        self._uniques_modified = []
-        self._history = {}
+        # Only allocated once a unique or revision tracked property is modified after init, or a cached computed
+        # property is read; many resources (e.g. query results) never need them.
+        self._uniques_modified = None
+        self._history = None
+        self._computed_values = None  # Cached ComputedResourceProperty values; cleared whenever a property is set
         self._set_attributes(kwargs)
         self._init_complete = True
 
+    def __getstate__(self):
+        """Pickle the slot values along with any instance __dict__ (subclasses without __slots__ have one)."""
+        state = dict(getattr(self, '__dict__', ()))
+        for klass in type(self).__mro__:
+            slots = klass.__dict__.get('__slots__', ())
+            if isinstance(slots, basestring):
+                slots = (slots,)
+            for name in slots:
+                if name in ('__dict__', '__weakref__'):
+                    continue
+                try:
+                    state[name] = getattr(self, name)
+                except AttributeError:
+                    pass  # Slot was never set
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled resource, including ones pickled before BaseResource declared __slots__."""
+        if isinstance(state, tuple):
+            # (instance __dict__, slot values) state from the default protocol 2 pickling; only written by the
+            # version that added __slots__ before __getstate__ existed.
+            instance_state, slot_state = state
+            state = dict(instance_state or ())
+            state.update(slot_state or ())
+        self._init_complete = state.pop('_init_complete', True)
+        self._values = state.pop('_values', None) or {}
+        self._uniques_modified = state.pop('_uniques_modified', None)
+        self._history = state.pop('_history', None)
+        self._computed_values = state.pop('_computed_values', None)
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+
     def _set_attributes(self, kwds):
         """Internal helper to set attributes from keyword arguments.
 
         Expando overrides this.
         """
-        cls = self.__class__
+        if not self._init_complete:
+            if self._plain_property_names.issuperset(kwds):
+                # None of the properties format their initial value so copy them all in at once
+                self._values.update(kwds)
+                return
+
+            # Initial values can't be immutable, unique or revision violations, so properties using the standard
+            # __set__ only need formatting; write those straight into _values.
+            initial_value_formats = self._initial_value_formats
+            values = self._values
+            remaining = {}
+            for name, value in kwds.iteritems():
+                if name in initial_value_formats:
+                    formatter = initial_value_formats[name]
+                    if value is not None and formatter is not None:
+                        value = formatter(value)
+                    values[name] = value
+                else:
+                    remaining[name] = value
+            kwds = remaining
+
+        properties = self._properties
         for name, value in kwds.iteritems():
-            prop = getattr(cls, name)  # Raises AttributeError for unknown properties.
-            if not isinstance(prop, BaseResourceProperty):
-                raise TypeError('Cannot set non-property %s' % name)
+            prop = properties.get(name)
+            if prop is None:
+                # Not a property name; could still be a code name that differs from the property name.
+                prop = getattr(self.__class__, name)  # Raises AttributeError for unknown properties.
+                if not isinstance(prop, BaseResourceProperty):
+                    raise TypeError('Cannot set non-property %s' % name)
             prop.__set__(self, value)
 
     def __repr__(self):
         """Return an unambiguous string representation of an entity."""
-        args = []
-        for prop in self._properties.itervalues():
-            if prop._has_value(self):
-                val = prop.__get__(self)
-                if val is None:
-                    rep = 'None'
-                else:
-                    rep = val
-                args.append('%s=%s' % (prop._name, rep))
-        args.sort()
+        if not self._values:
+            return '%s()' % self.__class__.__name__
+
+        values = self._values
+        args = ['%s=%s' % (prop._name, prop.__get__(self))
+                for prop in self._sorted_properties  # Already in name order
+                if prop._name in values]  # Inlined prop._has_value(self)
         s = '%s(%s)' % (self.__class__.__name__, ', '.join(args))
         return s
 
@@ -371,28 +804,41 @@ class BaseResource(object):
     def _fix_up_properties(cls):
         """Fix up the properties by calling their _fix_up() method.
 
+        The class dicts along the MRO are walked directly instead of resolving every name in dir(cls). The nearest
+        definition of a name wins, as with getattr, so a subclass can hide an inherited property with a non-property
+        attribute. Properties declared on plain mixin classes are fixed up here too.
+
         Note: This is called by MetaModel, but may also be called manually
         after dynamically updating a model class.
         """
-        cls._properties = {}  # Map of {name: Property}
-        cls._uniques = []  # Map of {name: Property}
-
-        if cls.__module__ == __name__:  # Skip the classes in *this* file.
-            return
-        for name in set(dir(cls)):
-            attr = getattr(cls, name, None)
-            if isinstance(attr, BaseResourceProperty):
-                if name.startswith('_'):
-                    raise TypeError('ModelAttribute %s cannot begin with an underscore '
-                                    'character. _ prefixed attributes are reserved for '
-                                    'temporary Model instance values.' % name)
-                attr._fix_up(cls, name)
-                cls._properties[attr._name] = attr
-                try:
-                    if attr._unique:
-                        cls._uniques.append(attr._name)
-                except AttributeError:
-                    pass
+        properties = {}  # Map of {name: Property}
+        seen = set()
+        for klass in cls.__mro__:
+            if klass is object:
+                continue
+            for name, attr in klass.__dict__.iteritems():
+                if name in seen:
+                    continue  # Shadowed by a class earlier in the MRO
+                seen.add(name)
+                if isinstance(attr, BaseResourceProperty):
+                    if name.startswith('_'):
+                        raise TypeError('ModelAttribute %s cannot begin with an underscore '
+                                        'character. _ prefixed attributes are reserved for '
+                                        'temporary Model instance values.' % name)
+                    attr._fix_up(cls, name)
+                    properties.setdefault(attr._name, attr)
+
+        cls._properties = properties
+        cls._sorted_properties = tuple(prop for _, prop in sorted(properties.iteritems()))
+        initial_value_formats = {}
+        for name, prop in properties.iteritems():
+            direct, formatter = prop._initial_value_format()
+            if direct:
+                initial_value_formats[name] = formatter
+        cls._initial_value_formats = initial_value_formats
+        cls._plain_property_names = frozenset(name for name, formatter in initial_value_formats.iteritems()
+                                              if formatter is None)
+        cls._uniques = sorted(name for name, prop in properties.iteritems() if getattr(prop, '_unique', False))
 
 
 class Resource(BaseResource):
@@ -404,6 +850,8 @@ class Resource(BaseResource):
     datastore on insert. Same goes for the timestamps.
 
     """
+    __slots__ = ()
+
     # name=None, default=None, title='', immutable=False, unique=False, track_revisions=True, strip_whitespace=True, force_lowercase=False
     uid = ResourceProperty(title=u'UID', immutable=True, track_revisions=False)
     created = ResourceProperty(title=u'Created', immutable=True, track_revisions=False)
@@ -363,13 +363,16 @@ class BaseDatastoreInterface(object):
 
         uniques = {}
         old_values = {}
+        # Both are None until the resource has been modified
+        uniques_modified = resource_object._uniques_modified or ()
+        history = resource_object._history or {}
         for unique in resource_object._uniques:
-            if unique in resource_object._uniques_modified or force:
+            if unique in uniques_modified or force:
                 value = getattr(resource_object, unique)
                 if value:
                     uniques[unique] = value
                     try:
-                        old_values[unique] = resource_object._history[unique][0]
+                        old_values[unique] = history[unique][0]
                     except KeyError:
                         # There is no old value
                         pass
@@ -32,6 +32,9 @@ from google.appengine.ext import ndb
 
 __author__ = 'Matt Badger'
 
+# Resolved once; checking its receivers dict is cheaper than has_receivers_for() on every permission check.
+_user_can_hook = signal('user_can')
+
 
 class PermissionDenied(Exception):
     pass
@@ -101,9 +104,9 @@ class RBAC(Resource):
                 if not valid:
                     return False
 
-                if signal('user_can').has_receivers_for(cls):
+                if _user_can_hook.receivers:
                     try:
-                        signal('user_can').send(cls, user=user, action=action, resource_uid=resource_uid)
+                        _user_can_hook.send(cls, user=user, action=action, resource_uid=resource_uid)
                     except PermissionDenied, e:
                         logging.debug(u'\'{}\' denied to {} because {}'.format(action, user.uid, e.message))
                         return False
@@ -130,9 +133,9 @@ class RBAC(Resource):
             if not valid:
                 return False
 
-            if signal('user_can').has_receivers_for(cls):
+            if _user_can_hook.receivers:
                 try:
-                    signal('user_can').send(cls, user=user, action=action, resource_uid=resource_uid)
+                    _user_can_hook.send(cls, user=user, action=action, resource_uid=resource_uid)
                 except PermissionDenied, e:
                     logging.debug(u'\'{}\' denied to {} because {}'.format(action, user.uid, e.message))
                     return False
@@ -242,6 +242,32 @@ class BaseSearchInterface(object):
         search_future = cls.search_async(query_string=query_string, *args, **kwargs)
         return cls.get_future_result(search_future)
 
+    @classmethod
+    def insert_multi(cls, resource_objects, *args, **kwargs):
+        """
+        Insert several resource objects. Starts every insert before resolving any of them. Derived classes should
+        override this if the search service supports batch puts.
+        :param resource_objects:
+        :param args:
+        :param kwargs:
+        :returns list of insert results:
+        """
+        insert_futures = [cls.insert_async(resource_object, *args, **kwargs) for resource_object in resource_objects]
+        return cls.get_future_result(insert_futures)
+
+    @classmethod
+    def delete_multi(cls, resource_object_uids, *args, **kwargs):
+        """
+        Delete several resource objects. Starts every delete before resolving any of them. Derived classes should
+        override this if the search service supports batch deletes.
+        :param resource_object_uids:
+        :param args:
+        :param kwargs:
+        """
+        delete_futures = [cls.delete_async(resource_object_uid, *args, **kwargs)
+                          for resource_object_uid in resource_object_uids]
+        cls.get_future_result(delete_futures)
+
     @classmethod
     def _convert_resource_object_to_search_record(cls, resource_object, **kwargs):
         """
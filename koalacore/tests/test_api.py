@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+    koala.test_api
+    ~~~~~~~~~~~~~~~~~~
+
+
+    :copyright: (c) 2015 Lighthouse
+    :license: LGPL
+"""
+import copy
+import pickle
+import threading
+import unittest
+import koalacore
+from koalacore import api
+from koalacore.search import BaseSearchInterface
+from blinker import signal
+
+__author__ = 'Matt Badger'
+
+
+class ArchivableMixin(object):
+    archived = koalacore.ResourceProperty(title=u'Archived')
+
+
+class TestDocument(ArchivableMixin, koalacore.Resource):
+    secret = koalacore.ResourceProperty(title=u'Secret')
+
+
+class TestPublicDocument(TestDocument):
+    secret = None
+
+
+class TestResourceProperties(unittest.TestCase):
+    def test_mixin_properties(self):
+        self.assertTrue('archived' in TestDocument._properties, u'Mixin property missing')
+        self.assertEqual(TestDocument.archived._name, 'archived', u'Mixin property not fixed up')
+
+        document = TestDocument(archived=u'yes', secret=u'hidden')
+        self.assertEqual(document.as_dict(), {'archived': u'yes', 'secret': u'hidden'}, u'Resource values mismatch')
+
+    def test_shadowed_property(self):
+        self.assertFalse('secret' in TestPublicDocument._properties, u'Shadowed property should be removed')
+        self.assertTrue('archived' in TestPublicDocument._properties, u'Inherited property missing')
+        self.assertRaises(TypeError, TestPublicDocument, secret=u'hidden')
+
+    def test_fix_up_properties_override(self):
+        fixed_up = []
+
+        class TrackedResource(koalacore.Resource):
+            @classmethod
+            def _fix_up_properties(cls):
+                # Runs while the class is being created, so it can't refer to TrackedResource by name
+                koalacore.Resource._fix_up_properties.__func__(cls)
+                fixed_up.append(cls.__name__)
+
+        class TrackedDocument(TrackedResource):
+            name = koalacore.ResourceProperty(title=u'Name')
+
+        self.assertEqual(fixed_up, ['TrackedResource', 'TrackedDocument'], u'Override not called')
+        self.assertTrue('name' in TrackedDocument._properties, u'Property missing')
+
+
+class TestUniqueDocument(koalacore.Resource):
+    name = koalacore.ResourceProperty(title=u'Name', unique=True)
+    count = koalacore.ResourceProperty(title=u'Count')
+    tags = koalacore.ResourceProperty(title=u'Tags')
+
+
+class AlwaysRecordedProperty(koalacore.ResourceProperty):
+    _skip_noop_writes = False
+
+
+class TestAlwaysRecordedDocument(koalacore.Resource):
+    name = AlwaysRecordedProperty(title=u'Name', unique=True)
+
+
+class TestResourceWrites(unittest.TestCase):
+    def test_unchanged_write_is_skipped(self):
+        document = TestUniqueDocument(name=u'doc', count=1)
+        document.name = u' doc '
+        document.count = 1
+
+        self.assertEqual(document._history, None, u'Unchanged writes should not be tracked')
+        self.assertEqual(document._uniques_modified, None, u'Unchanged writes should not modify uniques')
+
+    def test_unchanged_write_is_stored(self):
+        document = TestUniqueDocument(count=(1, [2]))
+        new_value = (1, [2])
+        document.count = new_value
+
+        self.assertTrue(document.count is new_value, u'Equal values should still be stored')
+        self.assertEqual(document._history, None, u'Unchanged writes should not be tracked')
+
+    def test_changed_write_is_tracked(self):
+        document = TestUniqueDocument(name=u'doc')
+        document.name = u'other'
+
+        self.assertEqual(document._history, {'name': (u'doc', u'other')}, u'History mismatch')
+        self.assertEqual(document._uniques_modified, ['name'], u'Uniques modified mismatch')
+
+    def test_type_change_is_tracked(self):
+        document = TestUniqueDocument(name='doc', count=1)
+        document.name = u'doc'
+        document.count = True
+
+        self.assertTrue(type(document.name) is unicode, u'Value type should be updated')
+        self.assertTrue(document.count is True, u'Value type should be updated')
+        self.assertEqual(document._history, {'name': ('doc', u'doc'), 'count': (1, True)}, u'History mismatch')
+        self.assertEqual(document._uniques_modified, ['name'], u'Uniques modified mismatch')
+
+    def test_mutable_write_is_tracked(self):
+        document = TestUniqueDocument(tags=[u'a'])
+        document.tags = [u'a']
+
+        self.assertEqual(document._history, {'tags': ([u'a'], [u'a'])}, u'List writes should always be tracked')
+
+    def test_skip_noop_writes_disabled(self):
+        document = TestAlwaysRecordedDocument(name=u'doc')
+        document.name = u'doc'
+
+        self.assertEqual(document._history, {'name': (u'doc', u'doc')}, u'History mismatch')
+        self.assertEqual(document._uniques_modified, ['name'], u'Uniques modified mismatch')
+
+
+class TestSlottedDocument(TestDocument):
+    __slots__ = ('cache',)
+
+
+class TestResourcePickling(unittest.TestCase):
+    def test_pickle_round_trip(self):
+        document = TestDocument(uid=u'doc1', secret=u'hidden')
+        document.secret = u'shown'
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            restored = pickle.loads(pickle.dumps(document, protocol))
+            self.assertEqual(restored.as_dict(), document.as_dict(), u'Values mismatch')
+            self.assertEqual(restored._history, {'secret': (u'hidden', u'shown')}, u'History mismatch')
+
+    def test_subclass_slots(self):
+        document = TestSlottedDocument(uid=u'doc1', secret=u'hidden')
+        document.cache = u'cached'
+        for restored in (pickle.loads(pickle.dumps(document, 0)),
+                         pickle.loads(pickle.dumps(document, pickle.HIGHEST_PROTOCOL)),
+                         copy.copy(document)):
+            self.assertEqual(restored.cache, u'cached', u'Subclass slot value missing')
+            self.assertEqual(restored.as_dict(), document.as_dict(), u'Values mismatch')
+
+        self.assertFalse(hasattr(pickle.loads(pickle.dumps(TestSlottedDocument(), 2)), 'cache'),
+                         u'Unset slots should stay unset')
+
+    def test_legacy_state(self):
+        # Resources pickled before BaseResource declared __slots__ only have a __dict__ state
+        document = TestDocument.__new__(TestDocument)
+        document.__setstate__({'_init_complete': True, '_values': {'uid': u'doc1', 'secret': u'hidden'},
+                               '_uniques_modified': [], '_history': {}})
+
+        self.assertEqual(document.secret, u'hidden', u'Legacy value mismatch')
+        document.secret = u'shown'
+        self.assertEqual(document._history, {'secret': (u'hidden', u'shown')}, u'History mismatch')
+        self.assertEqual(document._computed_values, None, u'Computed values should default to None')
+
+
+class FakeFuture(object):
+    def __init__(self, result):
+        self._result = result
+
+    def get_result(self):
+        return self._result
+
+
+class FakeDatastoreInterface(object):
+    resources = {}
+
+    @classmethod
+    def insert_async(cls, resource_object, **kwargs):
+        cls.resources[resource_object.uid] = resource_object
+        return FakeFuture(resource_object.uid)
+
+    @classmethod
+    def insert(cls, resource_object, **kwargs):
+        cls.resources[resource_object.uid] = resource_object
+        return resource_object.uid
+
+    @classmethod
+    def get(cls, resource_uid, **kwargs):
+        return cls.resources.get(resource_uid)
+
+    @classmethod
+    def get_async(cls, resource_uid, **kwargs):
+        return FakeFuture(cls.resources.get(resource_uid))
+
+    @classmethod
+    def update_async(cls, resource_object, **kwargs):
+        cls.resources[resource_object.uid] = resource_object
+        return FakeFuture(resource_object.uid)
+
+    @classmethod
+    def delete_async(cls, resource_uid, **kwargs):
+        cls.resources.pop(resource_uid, None)
+        return FakeFuture(None)
+
+    @classmethod
+    def parse_insert_async_result(cls, future):
+        return future.get_result()
+
+    parse_get_async_result = parse_insert_async_result
+    parse_update_async_result = parse_insert_async_result
+    parse_delete_async_result = parse_insert_async_result
+
+
+class FakeSearchInterface(BaseSearchInterface):
+    records = {}
+
+    @classmethod
+    def _internal_insert(cls, search_record, *args, **kwargs):
+        cls.records[search_record.uid] = search_record
+        return FakeFuture(search_record.uid)
+
+    @classmethod
+    def _internal_delete(cls, search_record_uid, *args, **kwargs):
+        cls.records.pop(search_record_uid, None)
+        return FakeFuture(None)
+
+    @classmethod
+    def _convert_resource_object_to_search_record(cls, resource_object, **kwargs):
+        return resource_object
+
+
+class TestAPI(api.BaseAPI):
+    _api_model = TestDocument
+    _datastore_interface = FakeDatastoreInterface
+    _search_interface = FakeSearchInterface
+
+
+class BatchedTestAPI(TestAPI):
+    _batch_search_index_updates = True
+
+
+class DeferredRecorder(object):
+    def __init__(self):
+        self.calls = []
+
+    def defer(self, func, *args, **kwargs):
+        self.calls.append((func, args, kwargs))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for func, args, kwargs in calls:
+            kwargs.pop('_queue', None)
+            func(*args, **kwargs)
+
+
+class SignalRecorder(object):
+    def __init__(self):
+        self.activations = []
+        self._receivers = []
+
+    def connect(self, signal_name, sender):
+        def receiver(sender, **kwargs):
+            self.activations.append((signal_name, kwargs))
+
+        self._receivers.append((signal_name, receiver))
+        signal(signal_name).connect(receiver, sender=sender)
+
+    def disconnect(self):
+        for signal_name, receiver in self._receivers:
+            signal(signal_name).disconnect(receiver)
+
+
+class APITestCase(unittest.TestCase):
+    def setUp(self):
+        FakeDatastoreInterface.resources = {}
+        FakeSearchInterface.records = {}
+        self.deferred = DeferredRecorder()
+        self._deferred = api.deferred
+        api.deferred = self.deferred
+        self.signal_recorder = SignalRecorder()
+        api._pending_search_index_updates.__dict__.clear()
+
+    def tearDown(self):
+        api.deferred = self._deferred
+        self.signal_recorder.disconnect()
+
+
+class TestBaseAPIMulti(APITestCase):
+    def test_insert_multi(self):
+        self.signal_recorder.connect('pre_insert_multi', sender=TestAPI)
+        self.signal_recorder.connect('post_insert_multi', sender=TestAPI)
+        documents = [TestDocument(uid=u'doc1'), TestDocument(uid=u'doc2')]
+
+        result = TestAPI.insert_multi(resource_objects=documents, auth_uid=u'user1')
+
+        self.assertEqual(result, [u'doc1', u'doc2'], u'Insert multi result mismatch')
+        self.assertEqual(self.signal_recorder.activations, [
+            ('pre_insert_multi', {'resource_objects': documents, 'auth_uid': u'user1'}),
+            ('post_insert_multi', {'result': result, 'resource_uids': result, 'resource_objects': documents,
+                                   'auth_uid': u'user1'}),
+        ], u'Signal payload mismatch')
+        self.assertEqual(self.deferred.calls, [
+            (TestAPI._update_search_index_batch, (), {'resource_uids': [u'doc1', u'doc2'],
+                                                      '_queue': TestAPI._search_index_queue}),
+        ], u'Insert multi should queue a single search index task')
+
+        self.deferred.run()
+        self.assertEqual(sorted(FakeSearchInterface.records), [u'doc1', u'doc2'], u'Search index mismatch')
+
+    def test_get_multi(self):
+        document = TestDocument(uid=u'doc1')
+        FakeDatastoreInterface.resources[u'doc1'] = document
+        self.signal_recorder.connect('pre_get_multi', sender=TestAPI)
+        self.signal_recorder.connect('post_get_multi', sender=TestAPI)
+
+        result = TestAPI.get_multi(resource_uids=[u'doc1', u'missing'])
+
+        self.assertEqual(result, [document, None], u'Get multi result mismatch')
+        self.assertEqual(self.signal_recorder.activations, [
+            ('pre_get_multi', {'resource_uids': [u'doc1', u'missing']}),
+            ('post_get_multi', {'result': result, 'resource_uids': [u'doc1', u'missing']}),
+        ], u'Signal payload mismatch')
+        self.assertEqual(self.deferred.calls, [], u'Get multi should not queue tasks')
+
+    def test_update_multi(self):
+        self.signal_recorder.connect('post_update_multi', sender=TestAPI)
+        documents = [TestDocument(uid=u'doc1', secret=u'a'), TestDocument(uid=u'doc2', secret=u'b')]
+
+        result = TestAPI.update_multi(resource_objects=documents)
+
+        self.assertEqual(result, [u'doc1', u'doc2'], u'Update multi result mismatch')
+        self.assertEqual(self.signal_recorder.activations, [
+            ('post_update_multi', {'result': result, 'resource_uids': result, 'resource_objects': documents,
+                                   'auth_uid': None}),
+        ], u'Signal payload mismatch')
+        self.assertEqual([call[0] for call in self.deferred.calls], [TestAPI._update_search_index_batch],
+                         u'Update multi should queue a single search index task')
+
+    def test_delete_multi(self):
+        FakeDatastoreInterface.resources = {u'doc1': TestDocument(uid=u'doc1'), u'doc2': TestDocument(uid=u'doc2')}
+        FakeSearchInterface.records = dict(FakeDatastoreInterface.resources)
+        self.signal_recorder.connect('post_delete_multi', sender=TestAPI)
+
+        TestAPI.delete_multi(resource_uids=[u'doc1', u'doc2'], auth_uid=u'user1')
+
+        self.assertEqual(FakeDatastoreInterface.resources, {}, u'Resources should be deleted')
+        self.assertEqual(self.signal_recorder.activations, [
+            ('post_delete_multi', {'result': None, 'resource_uids': [u'doc1', u'doc2'], 'auth_uid': u'user1'}),
+        ], u'Signal payload mismatch')
+        self.assertEqual(self.deferred.calls, [
+            (TestAPI._delete_search_index_batch, (), {'resource_uids': [u'doc1', u'doc2'],
+                                                      '_queue': TestAPI._search_index_queue}),
+        ], u'Delete multi should queue a single search index task')
+
+        self.deferred.run()
+        self.assertEqual(FakeSearchInterface.records, {}, u'Search records should be deleted')
+
+
+class FailingDeferred(DeferredRecorder):
+    """Fails to queue tasks for the given APIs (all of them if none are given)."""
+    def __init__(self, *failing_apis):
+        super(FailingDeferred, self).__init__()
+        self.failing_apis = failing_apis
+
+    def defer(self, func, *args, **kwargs):
+        if not self.failing_apis or func.__self__ in self.failing_apis:
+            raise RuntimeError(u'Task queue unavailable')
+        super(FailingDeferred, self).defer(func, *args, **kwargs)
+
+
+class OtherBatchedTestAPI(BatchedTestAPI):
+    pass
+
+
+class TestSearchIndexUpdates(APITestCase):
+    def test_unbatched_update(self):
+        self.signal_recorder.connect('post_get', sender=TestAPI)
+
+        TestAPI.insert(resource_object=TestDocument(uid=u'doc1'))
+
+        self.assertEqual(self.deferred.calls, [
+            (TestAPI._update_search_index, (), {'resource_uid': u'doc1', '_queue': TestAPI._search_index_queue}),
+        ], u'Insert should queue a search index task')
+        self.deferred.run()
+        self.assertEqual(FakeSearchInterface.records.keys(), [u'doc1'], u'Search index mismatch')
+        self.assertEqual([name for name, _ in self.signal_recorder.activations], ['post_get'],
+                         u'Index update should load the resource through the API')
+
+    def test_batched_updates(self):
+        self.signal_recorder.connect('post_get_multi', sender=BatchedTestAPI)
+
+        BatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc1'))
+        BatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc2'))
+        BatchedTestAPI.update_multi(resource_objects=[TestDocument(uid=u'doc1')])
+        self.assertEqual(self.deferred.calls, [], u'Batched updates should wait for a flush')
+
+        BatchedTestAPI.flush_search_index_updates()
+        self.assertEqual(self.deferred.calls, [
+            (BatchedTestAPI._update_search_index_batch, (), {'resource_uids': [u'doc1', u'doc2'],
+                                                             '_queue': BatchedTestAPI._search_index_queue}),
+        ], u'Flush should queue a single task without duplicate uids')
+
+        self.deferred.run()
+        self.assertEqual(sorted(FakeSearchInterface.records), [u'doc1', u'doc2'], u'Search index mismatch')
+        self.assertEqual([name for name, _ in self.signal_recorder.activations], ['post_get_multi'],
+                         u'Batch index update should load the resources through the API')
+
+        BatchedTestAPI.flush_search_index_updates()
+        self.assertEqual(self.deferred.calls, [], u'Nothing should be pending after a flush')
+
+    def test_batched_updates_are_per_thread(self):
+        thread = threading.Thread(target=BatchedTestAPI.insert, kwargs={'resource_object': TestDocument(uid=u'doc1')})
+        thread.start()
+        thread.join()
+
+        BatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc2'))
+        api.flush_search_index_updates()
+
+        self.assertEqual(self.deferred.calls, [
+            (BatchedTestAPI._update_search_index_batch, (), {'resource_uids': [u'doc2'],
+                                                             '_queue': BatchedTestAPI._search_index_queue}),
+        ], u'Only updates queued on this thread should be flushed')
+
+    def test_failed_flush_keeps_updates(self):
+        BatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc1'))
+
+        api.deferred = FailingDeferred()
+        self.assertRaises(RuntimeError, BatchedTestAPI.flush_search_index_updates)
+
+        api.deferred = self.deferred
+        BatchedTestAPI.flush_search_index_updates()
+        self.assertEqual([call[2]['resource_uids'] for call in self.deferred.calls], [[u'doc1']],
+                         u'Updates should be kept pending until they are queued')
+
+    def test_failed_flush_all_clears_updates(self):
+        BatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc1'))
+        OtherBatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc2'))
+
+        api.deferred = FailingDeferred(BatchedTestAPI)
+        self.assertRaises(RuntimeError, api.flush_search_index_updates)
+        self.assertEqual([call[2]['resource_uids'] for call in api.deferred.calls], [[u'doc2']],
+                         u'Other APIs should still be flushed')
+
+        api.deferred = self.deferred
+        api.flush_search_index_updates()
+        self.assertEqual(self.deferred.calls, [], u'Failed updates should not leak into the next flush')
+
+
+class TestSearchIndexUpdateMiddleware(APITestCase):
+    def wsgi_app(self, environ, start_response):
+        BatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc1'))
+        if environ.get('fail'):
+            raise ValueError(u'Application error')
+        start_response('200 OK', [])
+        return ['done']
+
+    def test_flush_on_success(self):
+        app = koalacore.SearchIndexUpdateMiddleware(self.wsgi_app)
+
+        self.assertEqual(app({}, lambda status, headers: None), ['done'], u'Response mismatch')
+        self.assertEqual([call[0] for call in self.deferred.calls], [BatchedTestAPI._update_search_index_batch],
+                         u'Updates should be flushed after the request')
+
+    def test_flush_on_exception(self):
+        app = koalacore.SearchIndexUpdateMiddleware(self.wsgi_app)
+
+        self.assertRaises(ValueError, app, {'fail': True}, lambda status, headers: None)
+        self.assertEqual([call[0] for call in self.deferred.calls], [BatchedTestAPI._update_search_index_batch],
+                         u'Updates should be flushed even if the application raised')
+
+    def test_flush_failure_does_not_hide_application_error(self):
+        api.deferred = FailingDeferred()
+        app = koalacore.SearchIndexUpdateMiddleware(self.wsgi_app)
+
+        self.assertRaises(ValueError, app, {'fail': True}, lambda status, headers: None)
+
+    def test_flush_failure_is_raised(self):
+        api.deferred = FailingDeferred()
+        app = koalacore.SearchIndexUpdateMiddleware(self.wsgi_app)
+
+        self.assertRaises(RuntimeError, app, {}, lambda status, headers: None)
+
+    def test_flush_all_apis(self):
+        BatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc1'))
+        OtherBatchedTestAPI.insert(resource_object=TestDocument(uid=u'doc2'))
+        koalacore.flush_search_index_updates()
+
+        self.assertEqual(sorted((call[0].__self__.__name__, call[2]['resource_uids']) for call in self.deferred.calls),
+                         [('BatchedTestAPI', [u'doc1']), ('OtherBatchedTestAPI', [u'doc2'])],
+                         u'Each API should queue a single task')
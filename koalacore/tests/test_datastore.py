@@ -241,6 +241,23 @@ class TestEventedNDBDatastore(unittest.TestCase):
         self.assertTrue(TestEventedNDB._hook_transaction_pre_delete_enabled, u'TRANSACTIONAL DELETE pre hook should be active')
         self.assertTrue(TestEventedNDB._hook_transaction_post_delete_enabled, u'TRANSACTIONAL DELETE post hook should be active')
 
+    def test_signal_activation_inherited(self):
+        class TestEventedNDB(koalacore.NDBEventedInterface):
+            _datastore_model = NDBTestModel
+            _resource_object = TestModel
+
+        class SubEventedNDB(TestEventedNDB):
+            pass
+
+        # Subscribe to signals
+        signal(TestEventedNDB.HOOK_PRE_GET).connect(self.signal_subscriber, sender=SubEventedNDB)
+
+        # Flags parsed on the base interface are inherited, so receivers for a subclass must enable the hook
+        TestEventedNDB.parse_signal_receivers()
+
+        self.assertTrue(TestEventedNDB._hook_pre_get_enabled, u'GET pre hook should be active')
+        self.assertTrue(SubEventedNDB._hook_pre_get_enabled, u'GET pre hook should be active for the subclass')
+
     def test_computed_properties_blank(self):
         class TestEventedNDB(koalacore.NDBEventedInterface):
             _datastore_model = NDBTestModel
@@ -250,6 +267,29 @@ class TestEventedNDBDatastore(unittest.TestCase):
 
         self.assertEquals(test_resource.computed, u'This is a test string', u'Computed Property Failed')
 
+    def test_computed_properties_cached(self):
+        compute_calls = []
+
+        def compute_example(entity):
+            compute_calls.append(entity)
+            return u'{}{}'.format((entity.example or ''), (entity.random_property or ''))
+
+        class CachedTestModel(TestModel):
+            cached_computed = koalacore.ComputedResourceProperty(title='Cached', compute_function=compute_example,
+                                                                 cached=True)
+
+        test_resource = CachedTestModel(example=u'This is a test string')
+
+        self.assertEquals(test_resource.cached_computed, u'This is a test string', u'Computed Property Failed')
+        self.assertEquals(test_resource.cached_computed, u'This is a test string', u'Computed Property Failed')
+        self.assertEquals(len(compute_calls), 1, u'Cached property should only be computed once')
+
+        test_resource.random_property = u'!'
+
+        self.assertEquals(test_resource.cached_computed, u'This is a test string!', u'Cache should be invalidated')
+        self.assertEquals(len(compute_calls), 2, u'Cached property should be recomputed after a set')
+        self.assertEquals(test_resource.computed, u'This is a test string!', u'Uncached property mismatch')
+
     def test_insert_async(self):
         class TestEventedNDB(koalacore.NDBEventedInterface):
             _datastore_model = NDBTestModel